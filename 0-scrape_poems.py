@@ -1,18 +1,42 @@
 import argparse
+import codecs
 import csv
+import gzip
 import json
 import logging
+import operator
+import os
 import random
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List
 from urllib.parse import urljoin
 
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+from requests.adapters import HTTPAdapter
 
 
 BASE_URL_TEMPLATE = "https://www.public-domain-poetry.com/listpoetry.php?letter=All&page={page}"
+CSV_FIELDS = ["title", "link", "lines", "views", "source_page"]
+_csv_record = operator.itemgetter(*CSV_FIELDS)
+
+# Text nodes that BeautifulSoup's get_text() would return (it skips script/style/template contents).
+_TEXT_NODES = etree.XPath(
+    ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False,
+)
+
+# Tables whose first row mentions every single-word header; the exact header check runs only on these.
+_POEM_TABLE_CANDIDATES = etree.XPath(
+    "//table[(.//tr)[1][contains(translate(string(.), 'AUTHORLINESVW', 'authorlinesvw'), 'author')"
+    " and contains(translate(string(.), 'AUTHORLINESVW', 'authorlinesvw'), 'lines')"
+    " and contains(translate(string(.), 'AUTHORLINESVW', 'authorlinesvw'), 'views')]]"
+)
 
 
 def parse_args() -> argparse.Namespace:
@@ -37,7 +61,7 @@ def parse_args() -> argparse.Namespace:
         "--delay",
         type=float,
         default=0.5,
-        help="Base delay in seconds between successful requests",
+        help="Minimum spacing in seconds between request starts, shared by all workers",
     )
     parser.add_argument(
         "--timeout",
@@ -51,6 +75,30 @@ def parse_args() -> argparse.Namespace:
         default=8,
         help="Max retries per page for transient/rate-limit responses",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of pages fetched concurrently",
+    )
+    parser.add_argument(
+        "--page-cache-dir",
+        type=Path,
+        default=Path(".cache/listing_pages"),
+        help="Where listing page bodies and their ETag/Last-Modified validators are kept for conditional GETs",
+    )
+    parser.add_argument(
+        "--max-empty-pages",
+        type=int,
+        default=2,
+        help="Stop after this many consecutive pages with no poem rows (0 to never stop early)",
+    )
+    parser.add_argument(
+        "--flush-every",
+        type=int,
+        default=10,
+        help="Flush the CSV and save the checkpoint every N pages",
+    )
     parser.add_argument(
         "--resume",
         action="store_true",
@@ -79,41 +127,70 @@ def setup_logging(level: str) -> None:
     )
 
 
-def load_checkpoint(path: Path) -> int | None:
+def load_checkpoint(path: Path) -> tuple[int, int] | None:
+    """Return (next_page, empty_pages), where empty_pages counts the empty pages just before next_page."""
     if not path.exists():
         return None
     try:
         data = json.loads(path.read_text(encoding="utf-8"))
         next_page = data.get("next_page")
+        empty_pages = data.get("empty_pages", 0)
         if isinstance(next_page, int) and next_page >= 1:
-            return next_page
+            return next_page, empty_pages if isinstance(empty_pages, int) and empty_pages >= 0 else 0
     except Exception as exc:
         logging.warning("Could not read checkpoint %s: %s", path, exc)
     return None
 
 
-def save_checkpoint(path: Path, next_page: int) -> None:
-    path.write_text(json.dumps({"next_page": next_page}, indent=2), encoding="utf-8")
+def save_checkpoint(path: Path, next_page: int, empty_pages: int = 0) -> None:
+    path.write_text(json.dumps({"next_page": next_page, "empty_pages": empty_pages}, indent=2), encoding="utf-8")
+
+
+def _write_bytes_atomic(path: Path, data: bytes) -> None:
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+        f.write(data)
+    os.replace(f.name, path)
+
+
+def load_validators(path: Path) -> Dict[str, Dict[str, str]]:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            return data
+    except Exception as exc:
+        logging.warning("Could not read validators %s: %s", path, exc)
+    return {}
+
+
+def save_validators(path: Path, validators: Dict[str, Dict[str, str]]) -> None:
+    _write_bytes_atomic(path, json.dumps(validators, indent=2, sort_keys=True).encode("utf-8"))
 
 
 def ensure_csv_header(path: Path) -> None:
     if not path.exists() or path.stat().st_size == 0:
         with path.open("w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(
-                f,
-                fieldnames=["title", "link", "lines", "views", "source_page"],
-            )
-            writer.writeheader()
+            csv.writer(f).writerow(CSV_FIELDS)
+
 
+def _node_text(node: lxml.html.HtmlElement, separator: str) -> str:
+    """Equivalent of BeautifulSoup's get_text(separator, strip=True) for an lxml element."""
+    return separator.join(text.strip() for text in _TEXT_NODES(node) if text.strip())
 
-def parse_poem_rows(html: str, page: int, base_url: str) -> List[Dict[str, str]]:
-    soup = BeautifulSoup(html, "html.parser")
+
+def parse_poem_rows(html: bytes, page: int, base_url: str) -> List[Dict[str, str]]:
+    try:
+        tree = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding="utf-8"))
+    except etree.ParserError as exc:
+        raise ValueError(f"Could not find poems table on page {page}") from exc
 
     target_table = None
-    for table in soup.find_all("table"):
+    for table in _POEM_TABLE_CANDIDATES(tree):
+        first_row = next(table.iter("tr"), None)
         header_cells = [
-            c.get_text(" ", strip=True).lower() for c in table.find_all("tr")[0].find_all(["td", "th"])
-        ] if table.find_all("tr") else []
+            _node_text(c, " ").lower() for c in first_row.iter("td", "th")
+        ] if first_row is not None else []
         if {"poem title", "author", "lines", "views"}.issubset(set(header_cells)):
             target_table = table
             break
@@ -122,19 +199,19 @@ def parse_poem_rows(html: str, page: int, base_url: str) -> List[Dict[str, str]]
         raise ValueError(f"Could not find poems table on page {page}")
 
     rows: List[Dict[str, str]] = []
-    tr_list = target_table.find_all("tr")
+    tr_list = list(target_table.iter("tr"))
     for tr in tr_list[1:]:
-        cells = tr.find_all("td")
+        cells = list(tr.iter("td"))
         if len(cells) < 4:
             continue
 
         title_cell = cells[0]
-        title = title_cell.get_text(" ", strip=True)
-        anchor = title_cell.find("a", href=True)
-        link = urljoin(base_url, anchor["href"]) if anchor else ""
+        title = _node_text(title_cell, " ")
+        href = next((a.get("href") for a in title_cell.iter("a") if a.get("href") is not None), None)
+        link = urljoin(base_url, href) if href is not None else ""
 
-        lines = cells[2].get_text(" ", strip=True)
-        views = cells[3].get_text(" ", strip=True)
+        lines = _node_text(cells[2], " ")
+        views = _node_text(cells[3], " ")
 
         if not title:
             continue
@@ -167,23 +244,56 @@ def compute_backoff_seconds(response: requests.Response | None, attempt: int, ba
     return exp + jitter
 
 
-def fetch_html_with_retries(
+def _utf8_body(response: requests.Response) -> bytes:
+    """Response body as UTF-8 bytes, re-encoding only when the server used another charset."""
+    encoding = response.encoding or "utf-8"
+    try:
+        is_utf8 = codecs.lookup(encoding).name == "utf-8"
+    except LookupError:
+        # Unknown charset labels: response.text falls back to a detected encoding, as requests does.
+        is_utf8 = False
+    if is_utf8:
+        return response.content
+    return response.text.encode("utf-8")
+
+
+def fetch_html_bytes_with_retries(
     session: requests.Session,
     url: str,
     timeout: float,
     max_retries: int,
     base_delay: float,
-) -> str:
+    validators: Dict[str, str] | None = None,
+) -> tuple[bytes | None, Dict[str, str]]:
+    """Fetch url, returning (body, validators); body is None when the server answers 304 to a conditional GET."""
     last_error: Exception | None = None
 
+    headers: Dict[str, str] = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
     for attempt in range(1, max_retries + 1):
         response = None
         try:
-            response = session.get(url, timeout=timeout)
+            response = session.get(url, timeout=timeout, headers=headers)
             status = response.status_code
 
+            if status == 304 and headers:
+                return None, validators or {}
+
             if status == 200:
-                return response.text
+                fresh = {
+                    key: value
+                    for key, value in (
+                        ("etag", response.headers.get("ETag")),
+                        ("last_modified", response.headers.get("Last-Modified")),
+                    )
+                    if value
+                }
+                return _utf8_body(response), fresh
 
             if status in {429, 500, 502, 503, 504}:
                 wait_s = compute_backoff_seconds(response, attempt, base_delay)
@@ -216,14 +326,23 @@ def fetch_html_with_retries(
     raise RuntimeError(f"Failed to fetch {url} after {max_retries} attempts") from last_error
 
 
-def append_rows_to_csv(path: Path, rows: List[Dict[str, str]]) -> None:
-    with path.open("a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=["title", "link", "lines", "views", "source_page"],
-        )
-        writer.writerows(rows)
-        f.flush()
+class RequestPacer:
+    """Spaces request starts at least interval seconds apart across threads, without waiting on responses."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
 
 
 def format_duration(seconds: float) -> str:
@@ -239,64 +358,139 @@ def main() -> None:
 
     if args.end_page < args.start_page:
         raise ValueError("--end-page must be >= --start-page")
+    if args.flush_every < 1:
+        raise ValueError("--flush-every must be >= 1")
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1")
+    if args.max_empty_pages < 0:
+        raise ValueError("--max-empty-pages must be >= 0")
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
     args.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    args.page_cache_dir.mkdir(parents=True, exist_ok=True)
 
     ensure_csv_header(args.output)
 
     start_page = args.start_page
+    empty_pages = 0
     if args.resume:
-        checkpoint_page = load_checkpoint(args.checkpoint)
-        if checkpoint_page is not None:
-            start_page = max(start_page, checkpoint_page)
+        checkpoint = load_checkpoint(args.checkpoint)
+        if checkpoint is not None:
+            checkpoint_page, checkpoint_empty = checkpoint
+            if checkpoint_page >= start_page:
+                start_page = checkpoint_page
+                empty_pages = checkpoint_empty
             logging.info("Resuming from checkpoint page %s", start_page)
 
+    if args.max_empty_pages and empty_pages >= args.max_empty_pages:
+        logging.info(
+            "Listing exhausted: checkpoint ends with %s consecutive empty pages before page %s",
+            empty_pages,
+            start_page,
+        )
+        return
+
     session = requests.Session()
+    # Every request goes to the same host; keep its connections alive and reuse them.
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(16, args.workers), max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     session.headers.update(
         {
             "User-Agent": "Mozilla/5.0 (compatible; PoetryScraper/1.0; +https://example.com)",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Connection": "keep-alive",
         }
     )
 
-    run_start = time.monotonic()
-    total_pages = args.end_page - start_page + 1
+    # ETag/Last-Modified per page; unchanged pages come back as 304 and are read from page_cache_dir.
+    validators_path = args.page_cache_dir / "etags.json"
+    validators = load_validators(validators_path)
+    validators_lock = threading.Lock()
+
+    def save_page_validators() -> None:
+        with validators_lock:
+            save_validators(validators_path, validators)
+
+    # Caps the aggregate request rate at 1/--delay while workers keep several requests in flight.
+    pacer = RequestPacer(args.delay)
 
-    for page in range(start_page, args.end_page + 1):
+    def fetch_page(page: int) -> bytes:
         url = BASE_URL_TEMPLATE.format(page=page)
+        body_path = args.page_cache_dir / f"page_{page}.html.gz"
+        with validators_lock:
+            known = validators.get(str(page)) if body_path.exists() else None
+        pacer.wait()
         logging.info("Fetching page %s/%s: %s", page, args.end_page, url)
-
-        html = fetch_html_with_retries(
+        html, fresh = fetch_html_bytes_with_retries(
             session=session,
             url=url,
             timeout=args.timeout,
             max_retries=args.max_retries,
             base_delay=args.delay,
+            validators=known,
         )
+        if html is None:
+            logging.debug("Page %s not modified; using cached body", page)
+            html = gzip.decompress(body_path.read_bytes())
+        elif fresh:
+            _write_bytes_atomic(body_path, gzip.compress(html, compresslevel=1))
+            with validators_lock:
+                validators[str(page)] = fresh
+        return html
 
-        rows = parse_poem_rows(html, page=page, base_url=url)
-        append_rows_to_csv(args.output, rows)
-
-        save_checkpoint(args.checkpoint, next_page=page + 1)
-        completed_pages = page - start_page + 1
-        elapsed_seconds = time.monotonic() - run_start
-        avg_seconds_per_page = elapsed_seconds / completed_pages
-        remaining_pages = total_pages - completed_pages
-        eta_seconds = avg_seconds_per_page * remaining_pages
-
-        logging.info(
-            "Saved %s rows from page %s | Progress: %s/%s | Elapsed: %s | ETA: %s",
-            len(rows),
-            page,
-            completed_pages,
-            total_pages,
-            format_duration(elapsed_seconds),
-            format_duration(eta_seconds),
-        )
+    run_start = time.monotonic()
+    total_pages = args.end_page - start_page + 1
+    pages = range(start_page, args.end_page + 1)
+
+    # Pages are fetched concurrently but consumed in order. The CSV is flushed right before each
+    # checkpoint save, so the checkpoint only ever advances past fully written pages.
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    written_through = saved_through = start_page - 1
+    with args.output.open("a", newline="", encoding="utf-8", buffering=1 << 20) as out:
+        writer = csv.writer(out)
+        try:
+            for page, html in zip(pages, executor.map(fetch_page, pages)):
+                url = BASE_URL_TEMPLATE.format(page=page)
+                rows = parse_poem_rows(html, page=page, base_url=url)
+                writer.writerows(map(_csv_record, rows))
+                written_through = page
+                empty_pages = 0 if rows else empty_pages + 1
+
+                completed_pages = page - start_page + 1
+                if completed_pages % args.flush_every == 0:
+                    out.flush()
+                    save_checkpoint(args.checkpoint, next_page=page + 1, empty_pages=empty_pages)
+                    save_page_validators()
+                    saved_through = page
+
+                elapsed_seconds = time.monotonic() - run_start
+                avg_seconds_per_page = elapsed_seconds / completed_pages
+                remaining_pages = total_pages - completed_pages
+                eta_seconds = avg_seconds_per_page * remaining_pages
+
+                logging.info(
+                    "Saved %s rows from page %s | Progress: %s/%s | Elapsed: %s | ETA: %s",
+                    len(rows),
+                    page,
+                    completed_pages,
+                    total_pages,
+                    format_duration(elapsed_seconds),
+                    format_duration(eta_seconds),
+                )
 
-        if args.delay > 0:
-            time.sleep(args.delay)
+                # Past the last populated listing page the site serves empty tables; stop instead of walking them.
+                if args.max_empty_pages and empty_pages >= args.max_empty_pages:
+                    logging.info("Stopping after %s consecutive empty pages (last: %s)", empty_pages, page)
+                    break
+        finally:
+            # Save progress before waiting on fetches still in flight; one stuck in backoff could take minutes.
+            executor.shutdown(wait=False, cancel_futures=True)
+            if written_through > saved_through:
+                out.flush()
+                save_checkpoint(args.checkpoint, next_page=written_through + 1, empty_pages=empty_pages)
+            executor.shutdown(wait=True)
+            save_page_validators()
 
     logging.info("Done. Data written to %s", args.output)
 
@@ -1,10 +1,17 @@
 import argparse
 import csv
+import hashlib
+import mmap
+import os
+import sqlite3
+from collections.abc import Callable, Iterator
+from contextlib import closing, contextmanager
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 
 
 DEFAULT_COLUMNS = ["title", "link", "lines", "views", "source_page"]
+WRITE_BUFFER_SIZE = 1 << 20
 
 
 def parse_args() -> argparse.Namespace:
@@ -29,49 +36,105 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_COLUMNS,
         help="Columns used to determine duplicates (default: all scraper columns).",
     )
+    parser.add_argument(
+        "--disk-keys",
+        action="store_true",
+        help="Track seen rows in a temporary on-disk index instead of memory (for inputs larger than RAM).",
+    )
     return parser.parse_args()
 
 
-def dedupe_csv(input_path: Path, output_path: Path, key_columns: list[str]) -> tuple[int, int]:
+@contextmanager
+def _mapped_lines(path: Path) -> Iterator[Iterator[str]]:
+    """Memory-map path and yield an iterator over its decoded lines (newlines kept, as csv expects)."""
+    with path.open("rb") as raw:
+        if os.fstat(raw.fileno()).st_size == 0:
+            yield iter(())
+            return
+        with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield (line.decode("utf-8") for line in iter(mapped.readline, b""))
+
+
+def _row_key(row: list[str], key_indices: list[int]) -> bytes:
+    fields = (row[i].strip() if i < len(row) else "" for i in key_indices)
+    return hashlib.blake2b(b"\0".join(field.encode("utf-8") for field in fields), digest_size=16).digest()
+
+
+@contextmanager
+def _seen_keys(disk: bool, temp_dir: Path) -> Iterator[Callable[[bytes], bool]]:
+    """Yield a function that records a key and returns True the first time that key is seen."""
+    if not disk:
+        seen: set[bytes] = set()
+
+        def add(key: bytes) -> bool:
+            if key in seen:
+                return False
+            seen.add(key)
+            return True
+
+        yield add
+        return
+
+    with TemporaryDirectory(dir=temp_dir) as tmp, closing(sqlite3.connect(Path(tmp) / "keys.db")) as db:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute("CREATE TABLE seen(key BLOB PRIMARY KEY) WITHOUT ROWID")
+
+        def add(key: bytes) -> bool:
+            return db.execute("INSERT OR IGNORE INTO seen(key) VALUES (?)", (key,)).rowcount == 1
+
+        yield add
+
+
+def dedupe_csv(
+    input_path: Path,
+    output_path: Path,
+    key_columns: list[str],
+    disk_keys: bool = False,
+) -> tuple[int, int]:
     if not input_path.exists():
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
-    seen: set[tuple[str, ...]] = set()
     total = 0
     kept = 0
 
-    with input_path.open("r", newline="", encoding="utf-8") as source:
-        reader = csv.DictReader(source)
-        if reader.fieldnames is None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with _mapped_lines(input_path) as source, _seen_keys(disk_keys, output_path.parent) as add_key:
+        reader = csv.reader(source)
+        header = next(reader, None)
+        if header is None:
             raise ValueError("Input CSV has no header row.")
 
-        missing = [col for col in key_columns if col not in reader.fieldnames]
+        missing = [col for col in key_columns if col not in header]
         if missing:
             raise ValueError(f"Missing key columns in CSV header: {', '.join(missing)}")
+        key_indices = [header.index(col) for col in key_columns]
+        width = len(header)
 
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with output_path.open("w", newline="", encoding="utf-8") as target:
-            writer = csv.DictWriter(target, fieldnames=reader.fieldnames)
-            writer.writeheader()
+        with output_path.open("w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as target:
+            writer = csv.writer(target)
+            writer.writerow(header)
 
             for row in reader:
+                if not row:
+                    continue
                 total += 1
-                key = tuple((row.get(col) or "").strip() for col in key_columns)
-                if key in seen:
+                if not add_key(_row_key(row, key_indices)):
                     continue
-                seen.add(key)
+                if len(row) < width:
+                    row.extend([""] * (width - len(row)))
                 writer.writerow(row)
                 kept += 1
 
     return total, kept
 
 
-def dedupe_in_place(input_path: Path, key_columns: list[str]) -> tuple[int, int]:
+def dedupe_in_place(input_path: Path, key_columns: list[str], disk_keys: bool = False) -> tuple[int, int]:
     with NamedTemporaryFile("w", delete=False, suffix=".csv", encoding="utf-8", newline="") as tmp:
         temp_path = Path(tmp.name)
 
     try:
-        total, kept = dedupe_csv(input_path, temp_path, key_columns)
+        total, kept = dedupe_csv(input_path, temp_path, key_columns, disk_keys)
         temp_path.replace(input_path)
         return total, kept
     finally:
@@ -83,10 +146,10 @@ def main() -> None:
     args = parse_args()
 
     if args.output is None:
-        total, kept = dedupe_in_place(args.input, args.key_columns)
+        total, kept = dedupe_in_place(args.input, args.key_columns, args.disk_keys)
         print(f"Done. Kept {kept}/{total} rows in {args.input}")
     else:
-        total, kept = dedupe_csv(args.input, args.output, args.key_columns)
+        total, kept = dedupe_csv(args.input, args.output, args.key_columns, args.disk_keys)
         print(f"Done. Kept {kept}/{total} rows in {args.output}")
 
 
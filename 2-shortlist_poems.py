@@ -1,22 +1,58 @@
 import argparse
+import codecs
 import csv
+import gzip
 import hashlib
 import json
+import os
 import random
 import re
+import tempfile
+import threading
 import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from statistics import quantiles
 
+import lxml.html
+import numpy as np
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+from requests.adapters import HTTPAdapter
 
 
 DEFAULT_MOD_PARAGRAPHS = Path(
     r"c:\Users\elec0\Documents\Sphere Saves\aliasblack.glyphica\mods\new_mod_1771905747820\content\mod.paragraphs"
 )
 
+# Part of the cached extracted-text file names; bump it whenever extract_poem_text changes what it returns.
+TEXT_CACHE_VERSION = 1
+# Likewise for the cached baseline bands; bump it whenever score_text or _tertiles changes.
+BANDS_CACHE_VERSION = 1
+
+# Text nodes that BeautifulSoup's get_text() would return (it skips script/style/template contents).
+_TEXT_NODES = etree.XPath(
+    ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False,
+)
+
+# Cells whose text could reach MIN_POEM_CHARS; string-length plus one separator per text node bounds _node_text's length.
+MIN_POEM_CHARS = 250
+_POEM_CELLS = etree.XPath(f"//td[string-length(.) + count(.//text()) > {MIN_POEM_CHARS}]")
+
+_BAD_MARKERS = ("Main Menu", "Sponsored Links")
+_DROP_PREFIXES = (
+    "Public Domain Poetry",
+    "Read, rate",
+    "Main Menu",
+)
+
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+
 
 @dataclass
 class Candidate:
@@ -39,60 +75,105 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output", type=Path, default=Path("shortlist_candidates.csv"))
     parser.add_argument("--seed", type=int, default=42)
     parser.add_argument("--timeout", type=float, default=20.0)
-    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=0.2,
+        help="Minimum spacing in seconds between network fetches, shared by all workers",
+    )
     parser.add_argument("--max-fetch", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent page fetches")
     parser.add_argument("--cache-dir", type=Path, default=Path(".cache/poem_pages"))
     return parser.parse_args()
 
 
-def normalize_for_difficulty(text: str) -> str:
-    text = re.sub(r"[^\w\s]", "", text, flags=re.UNICODE)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-
 def score_text(text: str) -> tuple[int, int]:
-    normalized = normalize_for_difficulty(text)
-    words = len(re.findall(r"\w+", normalized, flags=re.UNICODE))
-    return len(normalized), words
-
-
-def load_baseline_ranges(mod_path: Path) -> dict[str, tuple[tuple[int, int], tuple[int, int]]]:
-    data = json.loads(mod_path.read_text(encoding="utf-8"))
+    # Typed text is the words with punctuation removed and single spaces between them; one regex pass strips the punctuation.
+    tokens = _PUNCT_RE.sub("", text).split()
+    words = len(tokens)
+    return sum(map(len, tokens)) + max(0, words - 1), words
+
+
+def load_baseline_ranges(
+    mod_path: Path,
+    cache_dir: Path | None = None,
+) -> dict[str, tuple[tuple[int, int], tuple[int, int]]]:
+    raw = mod_path.read_bytes()
+    if cache_dir is None:
+        return _compute_baseline_ranges(raw, mod_path)
+
+    # The bands depend only on the file's content and the scoring code, so they are cached under both.
+    cache_file = cache_dir / f"bands_v{BANDS_CACHE_VERSION}_{hashlib.sha256(raw).hexdigest()}.json"
+    if cache_file.exists():
+        cached = json.loads(cache_file.read_text(encoding="utf-8"))
+        return {name: (tuple(chars), tuple(words)) for name, (chars, words) in cached.items()}
+
+    bands = _compute_baseline_ranges(raw, mod_path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=cache_dir, suffix=".tmp", delete=False) as f:
+        json.dump(bands, f)
+    os.replace(f.name, cache_file)
+    return bands
+
+
+def _compute_baseline_ranges(
+    raw: bytes,
+    mod_path: Path,
+) -> dict[str, tuple[tuple[int, int], tuple[int, int]]]:
+    data = orjson.loads(raw)
     passages = data.get("mod", [])
     if not passages:
         raise ValueError(f"No passages found in {mod_path}")
 
     metrics = [score_text(text) for text in passages]
-    char_values = sorted(chars for chars, _ in metrics)
-    word_values = sorted(words for _, words in metrics)
+    char_values = np.sort(np.fromiter((chars for chars, _ in metrics), dtype=np.int64, count=len(metrics)))
+    word_values = np.sort(np.fromiter((words for _, words in metrics), dtype=np.int64, count=len(metrics)))
 
-    char_q1, char_q2 = quantiles(char_values, n=3, method="inclusive")
-    word_q1, word_q2 = quantiles(word_values, n=3, method="inclusive")
+    char_q1, char_q2 = _tertiles(char_values)
+    word_q1, word_q2 = _tertiles(word_values)
 
-    char_min = min(char_values)
-    char_max = max(char_values)
-    word_min = min(word_values)
-    word_max = max(word_values)
+    char_min = int(char_values[0])
+    char_max = int(char_values[-1])
+    word_min = int(word_values[0])
+    word_max = int(word_values[-1])
 
     return {
-        "easy": ((char_min, int(char_q1)), (word_min, int(word_q1))),
-        "medium": ((int(char_q1) + 1, int(char_q2)), (int(word_q1) + 1, int(word_q2))),
-        "hard": ((int(char_q2) + 1, char_max + 80), (int(word_q2) + 1, word_max + 20)),
+        "easy": ((char_min, char_q1), (word_min, word_q1)),
+        "medium": ((char_q1 + 1, char_q2), (word_q1 + 1, word_q2)),
+        "hard": ((char_q2 + 1, char_max + 80), (word_q2 + 1, word_max + 20)),
     }
 
 
+def _tertiles(values: np.ndarray) -> tuple[int, int]:
+    """Truncated cut points of statistics.quantiles(values, n=3, method="inclusive") for sorted non-negative ints."""
+    # Interpolated in integers, like statistics does, so np.percentile's float positions cannot shift a bound by one.
+    last = len(values) - 1
+    cuts = []
+    for i in (1, 2):
+        j, delta = divmod(i * last, 3)
+        upper = values[min(j + 1, last)]
+        cuts.append(int(values[j] * (3 - delta) + upper * delta) // 3)
+    return cuts[0], cuts[1]
+
+
 def load_poems(csv_path: Path) -> list[dict[str, object]]:
     rows: list[dict[str, object]] = []
     seen_links: set[str] = set()
 
     with csv_path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        # Absent columns read as empty, as DictReader's missing keys did; short rows are padded the same way.
+        width = len(header) + 1
+        title_i, link_i, lines_i, views_i = (
+            header.index(col) if col in header else len(header) for col in ("title", "link", "lines", "views")
+        )
         for row in reader:
-            title = (row.get("title") or "").strip()
-            link = (row.get("link") or "").strip()
-            lines_raw = (row.get("lines") or "").strip()
-            views_raw = (row.get("views") or "").strip()
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            title = row[title_i].strip()
+            link = row[link_i].strip()
+            lines_raw = row[lines_i].strip()
 
             if not title or not link or title.startswith("Sponsored Links"):
                 continue
@@ -102,6 +183,7 @@ def load_poems(csv_path: Path) -> list[dict[str, object]]:
                 continue
 
             seen_links.add(link)
+            views_raw = row[views_i].strip()
             rows.append(
                 {
                     "title": title,
@@ -114,14 +196,22 @@ def load_poems(csv_path: Path) -> list[dict[str, object]]:
     return rows
 
 
-def extract_poem_text(html: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
+def _node_text(node: lxml.html.HtmlElement, separator: str) -> str:
+    """Equivalent of BeautifulSoup's get_text(separator, strip=True) for an lxml element."""
+    return separator.join(text.strip() for text in _TEXT_NODES(node) if text.strip())
+
+
+def extract_poem_text(html: bytes) -> str:
+    try:
+        tree = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding="utf-8"))
+    except etree.ParserError:
+        return ""
     candidates: list[str] = []
-    for td in soup.find_all("td"):
-        text = td.get_text("\n", strip=True)
-        if len(text) < 250:
+    for td in _POEM_CELLS(tree):
+        text = _node_text(td, "\n")
+        if len(text) < MIN_POEM_CHARS:
             continue
-        if "Main Menu" in text or "Sponsored Links" in text:
+        if any(marker in text for marker in _BAD_MARKERS):
             continue
         candidates.append(text)
 
@@ -131,118 +221,212 @@ def extract_poem_text(html: str) -> str:
     best = max(candidates, key=len)
     lines = [line.strip() for line in best.splitlines() if line.strip()]
 
-    drop_prefixes = (
-        "Public Domain Poetry",
-        "Read, rate",
-        "Main Menu",
-    )
-    cleaned: list[str] = []
-    for line in lines:
-        if any(line.startswith(prefix) for prefix in drop_prefixes):
-            continue
-        cleaned.append(line)
+    return " ".join(line for line in lines if not line.startswith(_DROP_PREFIXES))
+
 
-    return " ".join(cleaned)
+def _utf8_body(response: requests.Response) -> bytes:
+    """Response body as UTF-8 bytes, re-encoding only when the server used another charset."""
+    encoding = response.encoding or "utf-8"
+    try:
+        is_utf8 = codecs.lookup(encoding).name == "utf-8"
+    except LookupError:
+        # Unknown charset labels: response.text falls back to a detected encoding, as requests does.
+        is_utf8 = False
+    if is_utf8:
+        return response.content
+    return response.text.encode("utf-8")
 
 
 def fetch_candidate_text(session: requests.Session, url: str, timeout: float) -> str:
     response = session.get(url, timeout=timeout)
     response.raise_for_status()
-    return extract_poem_text(response.text)
+    return extract_poem_text(_utf8_body(response))
 
 
 def _cache_path(cache_dir: Path, url: str) -> Path:
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+    return cache_dir / f"{digest}.html"
+
+
+def _legacy_cache_path(cache_dir: Path, url: str) -> Path:
+    # Earlier runs named cache files by SHA-256; they are still read so nothing is refetched.
     digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
     return cache_dir / f"{digest}.html"
 
 
+def _write_gzip_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+        with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=1) as gz:
+            gz.write(data)
+    os.replace(f.name, path)
+
+
+class RequestPacer:
+    """Spaces request starts at least interval seconds apart across threads, without waiting on responses."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
 def fetch_candidate_text_cached(
     session: requests.Session,
     url: str,
     timeout: float,
     cache_dir: Path,
+    pacer: RequestPacer | None = None,
 ) -> str:
     cache_file = _cache_path(cache_dir, url)
-    if cache_file.exists():
-        html = cache_file.read_text(encoding="utf-8", errors="ignore")
-        return extract_poem_text(html)
+    legacy_file = _legacy_cache_path(cache_dir, url)
+    html_gz = cache_file.with_suffix(".html.gz")
+    text_gz = cache_file.with_suffix(f".v{TEXT_CACHE_VERSION}.txt.gz")
+
+    # The extracted text is cached next to the page, so cache hits skip HTML parsing entirely.
+    if text_gz.exists():
+        return gzip.decompress(text_gz.read_bytes()).decode("utf-8")
+
+    html: bytes | None = None
+    # Uncompressed .html files come from older runs (of this script or 3-build_band_mods.py).
+    for path in (html_gz, legacy_file.with_suffix(".html.gz"), cache_file, legacy_file):
+        if path.exists():
+            html = path.read_bytes()
+            if path.suffix == ".gz":
+                html = gzip.decompress(html)
+            break
 
-    response = session.get(url, timeout=timeout)
-    response.raise_for_status()
-    html = response.text
-    cache_file.parent.mkdir(parents=True, exist_ok=True)
-    cache_file.write_text(html, encoding="utf-8")
-    return extract_poem_text(html)
+    if html is None:
+        if pacer is not None:
+            pacer.wait()
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        html = _utf8_body(response)
+        _write_gzip_atomic(html_gz, html)
+
+    text = extract_poem_text(html)
+    _write_gzip_atomic(text_gz, text.encode("utf-8"))
+    return text
 
 
-def in_band(candidate: Candidate, band: tuple[tuple[int, int], tuple[int, int]]) -> bool:
-    (char_min, char_max), (word_min, word_max) = band
-    return (
-        char_min <= candidate.typed_chars <= char_max
-        and word_min <= candidate.words <= word_max
-    )
+def _axis_bounds(
+    bands: dict[str, tuple[tuple[int, int], tuple[int, int]]],
+    axis: int,
+) -> tuple[list[int], list[int]]:
+    return [band[axis][0] for band in bands.values()], [band[axis][1] for band in bands.values()]
+
+
+def _axis_band(value: int, lows: list[int], highs: list[int]) -> int | None:
+    # Bands are disjoint and ordered by their lower bounds, so the only candidate is the last one starting at or below value.
+    index = bisect_right(lows, value) - 1
+    if index >= 0 and value <= highs[index]:
+        return index
+    return None
+
+
+def classify_band(
+    candidate: Candidate,
+    band_names: list[str],
+    char_bounds: tuple[list[int], list[int]],
+    word_bounds: tuple[list[int], list[int]],
+) -> str | None:
+    index = _axis_band(candidate.typed_chars, *char_bounds)
+    if index is not None and index == _axis_band(candidate.words, *word_bounds):
+        return band_names[index]
+    return None
 
 
 def main() -> None:
     args = parse_args()
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1")
     random.seed(args.seed)
 
-    bands = load_baseline_ranges(args.mod_paragraphs)
+    bands = load_baseline_ranges(args.mod_paragraphs, args.cache_dir)
+    band_names = list(bands)
+    char_bounds = _axis_bounds(bands, 0)
+    word_bounds = _axis_bounds(bands, 1)
     all_poems = load_poems(args.poems_csv)
 
-    rough_pool = [row for row in all_poems if 8 <= int(row["lines"]) <= 60]
-    rough_pool.sort(key=lambda row: (int(row["views"]), -int(row["lines"])), reverse=True)
+    rough_pool = [row for row in all_poems if 8 <= row["lines"] <= 60]
+    rough_pool.sort(key=lambda row: (row["views"], -row["lines"]), reverse=True)
 
     shortlisted: dict[str, list[Candidate]] = {"easy": [], "medium": [], "hard": []}
     attempted = 0
 
     session = requests.Session()
+    # Every request goes to the same host; keep its connections alive and reuse them.
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(16, args.workers), max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     session.headers.update(
         {
             "User-Agent": "Mozilla/5.0 (compatible; GlyphicaShortlist/1.0)",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Connection": "keep-alive",
         }
     )
 
-    for row in rough_pool:
-        if all(len(shortlisted[name]) >= args.per_band for name in shortlisted):
-            break
-        if attempted >= args.max_fetch:
-            break
+    # Caps the aggregate request rate at 1/--delay; cache hits are not paced.
+    pacer = RequestPacer(args.delay)
 
-        attempted += 1
+    def fetch_row(row: dict[str, object]) -> str:
         try:
-            text = fetch_candidate_text_cached(
+            return fetch_candidate_text_cached(
                 session,
                 str(row["link"]),
                 args.timeout,
                 args.cache_dir,
+                pacer,
             )
         except Exception:
-            continue
+            return ""
+
+    # Fetch up to --workers rows ahead of the one being scored; results are still consumed in pool order.
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    upcoming = iter(rough_pool[: max(args.max_fetch, 0)])
+    pending = deque((row, executor.submit(fetch_row, row)) for row in islice(upcoming, args.workers))
+    try:
+        while pending:
+            if all(len(shortlisted[name]) >= args.per_band for name in shortlisted):
+                break
 
-        if not text:
-            continue
+            row, future = pending.popleft()
+            next_row = next(upcoming, None)
+            if next_row is not None:
+                pending.append((next_row, executor.submit(fetch_row, next_row)))
 
-        typed_chars, words = score_text(text)
-        candidate = Candidate(
-            title=str(row["title"]),
-            link=str(row["link"]),
-            lines=int(row["lines"]),
-            views=int(row["views"]),
-            typed_chars=typed_chars,
-            words=words,
-            text=text,
-        )
-
-        for band_name, band in bands.items():
-            if len(shortlisted[band_name]) >= args.per_band:
+            attempted += 1
+            text = future.result()
+            if not text:
                 continue
-            if in_band(candidate, band):
-                shortlisted[band_name].append(candidate)
-                break
 
-        time.sleep(args.delay)
+            typed_chars, words = score_text(text)
+            candidate = Candidate(
+                title=str(row["title"]),
+                link=str(row["link"]),
+                lines=row["lines"],
+                views=row["views"],
+                typed_chars=typed_chars,
+                words=words,
+                text=text,
+            )
+
+            band_name = classify_band(candidate, band_names, char_bounds, word_bounds)
+            if band_name is not None and len(shortlisted[band_name]) < args.per_band:
+                shortlisted[band_name].append(candidate)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
     with args.output.open("w", newline="", encoding="utf-8") as f:
@@ -1,13 +1,30 @@
 import argparse
 import csv
+import functools
+import gzip
 import hashlib
-import json
 import re
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from pathlib import Path
 
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+
+
+_PAGE_CACHE_LOCK = threading.Lock()
+
+_WS_RE = re.compile(r"\s+")
+_BY_RE = re.compile(r"^By\s+", re.IGNORECASE)
+_EXTRA_RE = re.compile(r"\s*Extra\s+Info:.*$", re.IGNORECASE)
+_PRINTABLE_RE = re.compile(r"\s*Printable\s+Page\s+This\s+page\s+viewed\s+\d+\s+times\.?$", re.IGNORECASE)
+# Junk markers are matched case-sensitively; only the byline prefix ignores case.
+_FILTER_RE = re.compile(r"(?P<junk>Public Domain Poetry|.*?Sponsored Links)|(?P<byline>(?i:By)\s)")
 
 
 def parse_args() -> argparse.Namespace:
@@ -19,6 +36,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--timeout", type=float, default=20.0)
     parser.add_argument("--target-per-band", type=int, default=10)
     parser.add_argument("--cache-dir", type=Path, default=Path(".cache/poem_pages"))
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent page fetches")
     return parser.parse_args()
 
 
@@ -27,22 +45,31 @@ def clean_poem_lines(lines: list[str], title: str) -> list[str]:
     dropped_title = False
     dropped_byline = False
 
-    normalized_title = re.sub(r"\s+", " ", title).strip().lower()
+    normalized_title = _WS_RE.sub(" ", title).strip().lower()
 
     for line in lines:
-        text = re.sub(r"\s+", " ", line).strip()
+        text = _WS_RE.sub(" ", line).strip()
         if not text:
             continue
 
-        if not dropped_title and text.lower() == normalized_title:
+        if (
+            not dropped_title
+            and normalized_title.startswith(text[:1].lower())
+            and text.lower() == normalized_title
+        ):
             dropped_title = True
             continue
 
-        if not dropped_byline and re.match(r"^By\s+", text, flags=re.IGNORECASE):
-            dropped_byline = True
+        match = _FILTER_RE.match(text)
+        kind = match.lastgroup if match else None
+        if kind == "junk":
+            # A junk line can still be the byline; keep the "drop only the first byline" bookkeeping intact.
+            if not dropped_byline and _BY_RE.match(text):
+                dropped_byline = True
             continue
 
-        if "Sponsored Links" in text or text.startswith("Public Domain Poetry"):
+        if kind == "byline" and not dropped_byline:
+            dropped_byline = True
             continue
 
         cleaned.append(text)
@@ -50,79 +77,146 @@ def clean_poem_lines(lines: list[str], title: str) -> list[str]:
     return cleaned
 
 
+@functools.lru_cache(maxsize=512)
+def _title_prefix_re(normalized_title: str) -> re.Pattern[str]:
+    return re.compile(
+        rf"^\s*{re.escape(normalized_title)}\s+By\s+[A-Z][\w'.\-]*(?:\s+[A-Z][\w'.\-]*(?:\s*\([^)]+\))?)*\s+",
+        re.IGNORECASE,
+    )
+
+
+def strip_title_prefix(text: str, title: str) -> str:
+    normalized_title = _WS_RE.sub(" ", title).strip()
+    if not normalized_title:
+        return text
+    prefix = text.lstrip()[: len(normalized_title)]
+    # Only an ASCII mismatch is conclusive; IGNORECASE also folds a few non-ASCII letters (e.g. "ſ" ~ "s").
+    if prefix.isascii() and normalized_title.isascii() and prefix.lower() != normalized_title.lower():
+        return text
+    return _title_prefix_re(normalized_title).sub("", text)
+
+
 def extract_poem_text(html: str, title: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
-    blocks: list[list[str]] = []
+    # Only <td> subtrees are ever inspected, so nothing outside them is turned into soup objects.
+    soup = BeautifulSoup(html, "lxml", parse_only=SoupStrainer("td"))
+    primary: list[tuple[int, list[str]]] = []
+    fallback: list[tuple[int, list[str]]] = []
 
     for td in soup.find_all("td"):
         raw_text = td.get_text("\n", strip=True)
-        if len(raw_text) < 250:
-            continue
-        if "Main Menu" in raw_text or "Sponsored Links" in raw_text:
+        if len(raw_text) < 180:
             continue
         lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
         if len(lines) < 6:
             continue
-        blocks.append(lines)
-
-    if not blocks:
-        for td in soup.find_all("td"):
-            raw_text = td.get_text("\n", strip=True)
-            if len(raw_text) < 180:
-                continue
-            lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
-            if len(lines) >= 6:
-                blocks.append(lines)
+        block = (sum(len(x) for x in lines), lines)
+        fallback.append(block)
+        if len(raw_text) >= 250 and "Main Menu" not in raw_text and "Sponsored Links" not in raw_text:
+            primary.append(block)
 
+    blocks = primary or fallback
     if not blocks:
         return ""
 
-    best_lines = max(blocks, key=lambda lines: sum(len(x) for x in lines))
+    _, best_lines = max(blocks, key=lambda block: block[0])
     cleaned_lines = clean_poem_lines(best_lines, title)
     text = " ".join(cleaned_lines)
-    text = re.sub(r"\s*Extra\s+Info:.*$", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\s*Printable\s+Page\s+This\s+page\s+viewed\s+\d+\s+times\.?$", "", text, flags=re.IGNORECASE)
+    text = _EXTRA_RE.sub("", text)
+    text = _PRINTABLE_RE.sub("", text)
 
     if title:
-        title_pattern = re.escape(re.sub(r"\s+", " ", title).strip())
-        text = re.sub(
-            rf"^\s*{title_pattern}\s+By\s+[A-Z][\w'.\-]*(?:\s+[A-Z][\w'.\-]*(?:\s*\([^)]+\))?)*\s+",
-            "",
-            text,
-            flags=re.IGNORECASE,
-        )
+        text = strip_title_prefix(text, title)
 
     # Keep the 'By Author', as it's nice to have and also very hard to properly strip it out without accidentally dropping real poem lines.
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _WS_RE.sub(" ", text).strip()
     return text
 
 
+@functools.lru_cache(maxsize=4096)
 def _cache_path(cache_dir: Path, url: str) -> Path:
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+    return cache_dir / f"{digest}.html"
+
+
+def _legacy_cache_path(cache_dir: Path, url: str) -> Path:
+    # Older runs of 2-shortlist_poems.py named cache files by SHA-256; reuse those instead of refetching.
     digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
     return cache_dir / f"{digest}.html"
 
 
+def open_page_cache(cache_dir: Path) -> sqlite3.Connection:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Shared by the fetch threads; every statement runs under _PAGE_CACHE_LOCK.
+    conn = sqlite3.connect(cache_dir / "pages.db", check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS pages(url TEXT PRIMARY KEY, html TEXT NOT NULL)")
+    conn.commit()
+    return conn
+
+
+def _store_page(cache: sqlite3.Connection, url: str, html: str) -> None:
+    with _PAGE_CACHE_LOCK:
+        cache.execute("INSERT OR REPLACE INTO pages(url, html) VALUES (?, ?)", (url, html))
+        cache.commit()
+
+
 def fetch_html_cached(
     session: requests.Session,
+    cache: sqlite3.Connection,
     url: str,
     timeout: float,
     cache_dir: Path,
 ) -> str:
-    cache_file = _cache_path(cache_dir, url)
-    if cache_file.exists():
-        return cache_file.read_text(encoding="utf-8", errors="ignore")
+    with _PAGE_CACHE_LOCK:
+        row = cache.execute("SELECT html FROM pages WHERE url = ?", (url,)).fetchone()
+    if row is not None:
+        return row[0]
+
+    # Pages cached as individual files (older runs, 2-shortlist_poems.py) are imported on first use.
+    own_file = _cache_path(cache_dir, url)
+    legacy_file = _legacy_cache_path(cache_dir, url)
+    for cache_file in (
+        own_file,
+        own_file.with_suffix(".html.gz"),
+        legacy_file,
+        legacy_file.with_suffix(".html.gz"),
+    ):
+        if cache_file.exists():
+            data = cache_file.read_bytes()
+            if cache_file.suffix == ".gz":
+                data = gzip.decompress(data)
+            html = data.decode("utf-8", errors="ignore")
+            _store_page(cache, url, html)
+            return html
 
     response = session.get(url, timeout=timeout)
     response.raise_for_status()
     html = response.text
-    cache_file.parent.mkdir(parents=True, exist_ok=True)
-    cache_file.write_text(html, encoding="utf-8")
+    _store_page(cache, url, html)
     return html
 
 
+def fetch_html_with_retries(
+    session: requests.Session,
+    cache: sqlite3.Connection,
+    url: str,
+    timeout: float,
+    cache_dir: Path,
+    attempts: int = 3,
+) -> str:
+    for attempt in range(attempts):
+        try:
+            return fetch_html_cached(session, cache, url, timeout, cache_dir)
+        except Exception:
+            pass
+        time.sleep(0.5 * (attempt + 1))
+    return ""
+
+
 def clean_sample_text(text: str) -> str:
-    cleaned = re.sub(r"\s*Extra\s+Info:.*$", "", text, flags=re.IGNORECASE)
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
+    cleaned = _EXTRA_RE.sub("", text)
+    cleaned = _WS_RE.sub(" ", cleaned).strip()
     return cleaned
 
 
@@ -140,15 +234,20 @@ def read_shortlist(path: Path) -> dict[str, list[dict[str, str]]]:
 
 def write_mod_file(path: Path, paragraphs: list[str]) -> None:
     payload = {"mod": paragraphs}
-    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    path.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
 
 
 def main() -> None:
     args = parse_args()
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1")
     args.out_dir.mkdir(parents=True, exist_ok=True)
 
     by_band = read_shortlist(args.shortlist)
     session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(16, args.workers))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     session.headers.update(
         {
             "User-Agent": "Mozilla/5.0 (compatible; GlyphicaBandMods/1.0)",
@@ -156,38 +255,42 @@ def main() -> None:
         }
     )
 
-    for band in ("easy", "medium", "hard"):
-        paragraphs: list[str] = []
-        for row in by_band.get(band, []):
-            if len(paragraphs) >= args.target_per_band:
-                break
-            title = (row.get("title") or "").strip()
-            link = (row.get("link") or "").strip()
-            if not link:
-                continue
-            poem_text = ""
-            for attempt in range(3):
-                try:
-                    html = fetch_html_cached(session, link, args.timeout, args.cache_dir)
-                    poem_text = extract_poem_text(html, title)
+    cache = open_page_cache(args.cache_dir)
+
+    def fetch_row(row: dict[str, str]) -> str:
+        return fetch_html_with_retries(session, cache, row["link"].strip(), args.timeout, args.cache_dir)
+
+    with closing(cache), ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for band in ("easy", "medium", "hard"):
+            paragraphs: list[str] = []
+            rows = [row for row in by_band.get(band, []) if (row.get("link") or "").strip()]
+            position = 0
+            while position < len(rows) and len(paragraphs) < args.target_per_band:
+                # Only fetch as many rows as are still needed; skipped rows are topped up by the next batch.
+                batch = rows[position : position + args.target_per_band - len(paragraphs)]
+                position += len(batch)
+                for row, html in zip(batch, executor.map(fetch_row, batch)):
+                    title = (row.get("title") or "").strip()
+                    link = row["link"].strip()
+                    poem_text = ""
+                    if html:
+                        try:
+                            poem_text = extract_poem_text(html, title)
+                        except Exception:
+                            pass
                     if poem_text:
-                        break
-                except Exception:
-                    pass
-                time.sleep(0.5 * (attempt + 1))
-            if poem_text:
-                paragraphs.append(poem_text)
-            else:
-                fallback = clean_sample_text((row.get("sample_text") or "").strip())
-                if fallback:
-                    paragraphs.append(fallback)
-                    print(f"{band}: fallback sample_text for {title} ({link})")
-                else:
-                    print(f"{band}: skipped {title} ({link})")
-
-        out_path = args.out_dir / f"mod.paragraphs.{band}"
-        write_mod_file(out_path, paragraphs)
-        print(f"{band}: wrote {len(paragraphs)} paragraphs -> {out_path}")
+                        paragraphs.append(poem_text)
+                    else:
+                        fallback = clean_sample_text((row.get("sample_text") or "").strip())
+                        if fallback:
+                            paragraphs.append(fallback)
+                            print(f"{band}: fallback sample_text for {title} ({link})")
+                        else:
+                            print(f"{band}: skipped {title} ({link})")
+
+            out_path = args.out_dir / f"mod.paragraphs.{band}"
+            write_mod_file(out_path, paragraphs)
+            print(f"{band}: wrote {len(paragraphs)} paragraphs -> {out_path}")
 
 
 if __name__ == "__main__":
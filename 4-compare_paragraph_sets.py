@@ -1,12 +1,13 @@
 import argparse
 import csv
-import json
-import re
+import string
 from dataclasses import dataclass
+from operator import attrgetter
 from pathlib import Path
-from statistics import mean, median
 
 import matplotlib.pyplot as plt
+import numpy as np
+import orjson
 
 
 DEFAULT_DATASETS = [
@@ -20,7 +21,20 @@ DEFAULT_DATASETS = [
 ]
 
 
-@dataclass
+class _PunctuationTable(dict):
+    """str.translate table that deletes non-word, non-space characters, filled in lazily per codepoint."""
+
+    def __missing__(self, codepoint: int) -> int | None:
+        char = chr(codepoint)
+        kept = codepoint if char.isalnum() or char.isspace() or char == "_" else None
+        self[codepoint] = kept
+        return kept
+
+
+_PUNCT_TABLE = _PunctuationTable({ord(char): None for char in string.punctuation if char != "_"})
+
+
+@dataclass(slots=True)
 class ParagraphMetrics:
     dataset: str
     index: int
@@ -64,20 +78,20 @@ def parse_dataset_specs(specs: list[str]) -> list[tuple[str, Path]]:
     return parsed
 
 
-def normalize_typed_text(text: str) -> str:
-    text = re.sub(r"[^\w\s]", "", text, flags=re.UNICODE)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+def _scan(text: str) -> tuple[int, list[str], int]:
+    """Return (typed_chars, words, word_chars); typed_chars counts the words plus one space between each."""
+    # Only word characters and whitespace survive the translate, so split() yields exactly the \w+ runs.
+    words = text.translate(_PUNCT_TABLE).split()
+    word_chars = sum(map(len, words))
+    return word_chars + max(len(words) - 1, 0), words, word_chars
 
 
 def compute_metrics(dataset: str, index: int, text: str) -> ParagraphMetrics:
     raw_chars = len(text)
-    typed_text = normalize_typed_text(text)
-    typed_chars = len(typed_text)
-    words_list = re.findall(r"\w+", typed_text, flags=re.UNICODE)
+    typed_chars, words_list, word_chars = _scan(text)
     words = len(words_list)
     unique_words = len({word.lower() for word in words_list})
-    avg_word_len = mean([len(word) for word in words_list]) if words_list else 0.0
+    avg_word_len = word_chars / words if words else 0.0
     punctuation_removed = max(raw_chars - typed_chars, 0)
     punctuation_ratio = (punctuation_removed / raw_chars) if raw_chars else 0.0
 
@@ -95,7 +109,7 @@ def compute_metrics(dataset: str, index: int, text: str) -> ParagraphMetrics:
 
 
 def load_paragraphs(path: Path) -> list[str]:
-    payload = json.loads(path.read_text(encoding="utf-8"))
+    payload = orjson.loads(path.read_bytes())
     paragraphs = payload.get("mod")
     if not isinstance(paragraphs, list):
         raise ValueError(f"File {path} does not contain a 'mod' list")
@@ -105,9 +119,9 @@ def load_paragraphs(path: Path) -> list[str]:
 def write_metrics_csv(path: Path, all_metrics: list[ParagraphMetrics]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=[
+        writer = csv.writer(f)
+        writer.writerow(
+            [
                 "dataset",
                 "index",
                 "raw_chars",
@@ -117,54 +131,69 @@ def write_metrics_csv(path: Path, all_metrics: list[ParagraphMetrics]) -> None:
                 "avg_word_len",
                 "punctuation_removed",
                 "punctuation_ratio",
-            ],
+            ]
         )
-        writer.writeheader()
-        for row in all_metrics:
-            writer.writerow(
-                {
-                    "dataset": row.dataset,
-                    "index": row.index,
-                    "raw_chars": row.raw_chars,
-                    "typed_chars": row.typed_chars,
-                    "words": row.words,
-                    "unique_words": row.unique_words,
-                    "avg_word_len": f"{row.avg_word_len:.4f}",
-                    "punctuation_removed": row.punctuation_removed,
-                    "punctuation_ratio": f"{row.punctuation_ratio:.6f}",
-                }
+        writer.writerows(
+            (
+                row.dataset,
+                row.index,
+                row.raw_chars,
+                row.typed_chars,
+                row.words,
+                row.unique_words,
+                f"{row.avg_word_len:.4f}",
+                row.punctuation_removed,
+                f"{row.punctuation_ratio:.6f}",
             )
+            for row in all_metrics
+        )
 
 
-def write_summary_json(path: Path, by_dataset: dict[str, list[ParagraphMetrics]]) -> None:
+def _column(rows: list[ParagraphMetrics], field: str, dtype: type) -> np.ndarray:
+    return np.fromiter(map(attrgetter(field), rows), dtype=dtype, count=len(rows))
+
+
+def build_columns(by_dataset: dict[str, list[ParagraphMetrics]]) -> dict[str, dict[str, np.ndarray]]:
+    return {
+        name: {
+            "typed_chars": _column(rows, "typed_chars", np.int32),
+            "words": _column(rows, "words", np.int32),
+            "unique_words": _column(rows, "unique_words", np.int32),
+            "punctuation_ratio": _column(rows, "punctuation_ratio", np.float64),
+        }
+        for name, rows in by_dataset.items()
+    }
+
+
+def write_summary_json(path: Path, columns: dict[str, dict[str, np.ndarray]]) -> None:
     summary: dict[str, dict[str, float | int]] = {}
-    for name, rows in by_dataset.items():
-        typed = [r.typed_chars for r in rows]
-        words = [r.words for r in rows]
-        uniq = [r.unique_words for r in rows]
-        punct = [r.punctuation_ratio for r in rows]
+    for name, cols in columns.items():
+        typed = cols["typed_chars"]
+        words = cols["words"]
+        uniq = cols["unique_words"]
+        punct = cols["punctuation_ratio"]
 
         summary[name] = {
-            "count": len(rows),
-            "typed_chars_mean": round(mean(typed), 2),
-            "typed_chars_median": round(median(typed), 2),
-            "typed_chars_min": min(typed),
-            "typed_chars_max": max(typed),
-            "words_mean": round(mean(words), 2),
-            "words_median": round(median(words), 2),
-            "words_min": min(words),
-            "words_max": max(words),
-            "unique_words_mean": round(mean(uniq), 2),
-            "punctuation_ratio_mean": round(mean(punct), 4),
+            "count": len(typed),
+            "typed_chars_mean": round(float(typed.mean()), 2),
+            "typed_chars_median": round(float(np.median(typed)), 2),
+            "typed_chars_min": int(typed.min()),
+            "typed_chars_max": int(typed.max()),
+            "words_mean": round(float(words.mean()), 2),
+            "words_median": round(float(np.median(words)), 2),
+            "words_min": int(words.min()),
+            "words_max": int(words.max()),
+            "unique_words_mean": round(float(uniq.mean()), 2),
+            "punctuation_ratio_mean": round(float(punct.mean()), 4),
         }
 
-    path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    path.write_bytes(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
 
 
-def plot_boxplots(path: Path, by_dataset: dict[str, list[ParagraphMetrics]]) -> None:
-    names = list(by_dataset.keys())
-    typed_data = [[r.typed_chars for r in by_dataset[name]] for name in names]
-    word_data = [[r.words for r in by_dataset[name]] for name in names]
+def plot_boxplots(path: Path, columns: dict[str, dict[str, np.ndarray]]) -> None:
+    names = list(columns.keys())
+    typed_data = [columns[name]["typed_chars"] for name in names]
+    word_data = [columns[name]["words"] for name in names]
 
     fig, axes = plt.subplots(1, 2, figsize=(14, 5))
     axes[0].boxplot(typed_data, tick_labels=names)
@@ -184,11 +213,10 @@ def plot_boxplots(path: Path, by_dataset: dict[str, list[ParagraphMetrics]]) ->
     plt.close(fig)
 
 
-def plot_histograms(path: Path, by_dataset: dict[str, list[ParagraphMetrics]]) -> None:
+def plot_histograms(path: Path, columns: dict[str, dict[str, np.ndarray]]) -> None:
     fig, ax = plt.subplots(figsize=(9, 6))
-    for name, rows in by_dataset.items():
-        values = [r.typed_chars for r in rows]
-        ax.hist(values, bins=8, alpha=0.5, label=name)
+    for name, cols in columns.items():
+        ax.hist(cols["typed_chars"], bins=8, alpha=0.5, label=name)
 
     ax.set_title("Distribution of Typed Characters")
     ax.set_xlabel("Typed characters")
@@ -200,12 +228,10 @@ def plot_histograms(path: Path, by_dataset: dict[str, list[ParagraphMetrics]]) -
     plt.close(fig)
 
 
-def plot_scatter(path: Path, by_dataset: dict[str, list[ParagraphMetrics]]) -> None:
+def plot_scatter(path: Path, columns: dict[str, dict[str, np.ndarray]]) -> None:
     fig, ax = plt.subplots(figsize=(9, 6))
-    for name, rows in by_dataset.items():
-        x = [r.words for r in rows]
-        y = [r.typed_chars for r in rows]
-        ax.scatter(x, y, label=name, alpha=0.8)
+    for name, cols in columns.items():
+        ax.scatter(cols["words"], cols["typed_chars"], label=name, alpha=0.8)
 
     ax.set_title("Words vs Typed Characters")
     ax.set_xlabel("Words")
@@ -217,10 +243,10 @@ def plot_scatter(path: Path, by_dataset: dict[str, list[ParagraphMetrics]]) -> N
     plt.close(fig)
 
 
-def plot_mean_bars(path: Path, by_dataset: dict[str, list[ParagraphMetrics]]) -> None:
-    names = list(by_dataset.keys())
-    typed_means = [mean([r.typed_chars for r in by_dataset[name]]) for name in names]
-    words_means = [mean([r.words for r in by_dataset[name]]) for name in names]
+def plot_mean_bars(path: Path, columns: dict[str, dict[str, np.ndarray]]) -> None:
+    names = list(columns.keys())
+    typed_means = [columns[name]["typed_chars"].mean() for name in names]
+    words_means = [columns[name]["words"].mean() for name in names]
 
     fig, axes = plt.subplots(1, 2, figsize=(14, 5))
 
@@ -256,19 +282,21 @@ def main() -> None:
 
     args.output_dir.mkdir(parents=True, exist_ok=True)
     write_metrics_csv(args.output_dir / "paragraph_metrics.csv", all_rows)
-    write_summary_json(args.output_dir / "dataset_summary.json", by_dataset)
 
-    plot_boxplots(args.output_dir / "boxplots_chars_words.png", by_dataset)
-    plot_histograms(args.output_dir / "hist_typed_chars.png", by_dataset)
-    plot_scatter(args.output_dir / "scatter_words_vs_chars.png", by_dataset)
-    plot_mean_bars(args.output_dir / "means_chars_words.png", by_dataset)
+    columns = build_columns(by_dataset)
+    write_summary_json(args.output_dir / "dataset_summary.json", columns)
+
+    plot_boxplots(args.output_dir / "boxplots_chars_words.png", columns)
+    plot_histograms(args.output_dir / "hist_typed_chars.png", columns)
+    plot_scatter(args.output_dir / "scatter_words_vs_chars.png", columns)
+    plot_mean_bars(args.output_dir / "means_chars_words.png", columns)
 
     print(f"Wrote analysis outputs to: {args.output_dir}")
-    for name, rows in by_dataset.items():
-        typed = [r.typed_chars for r in rows]
-        words = [r.words for r in rows]
+    for name, cols in columns.items():
+        typed = cols["typed_chars"]
+        words = cols["words"]
         print(
-            f"- {name}: count={len(rows)}, typed_chars_mean={mean(typed):.1f}, words_mean={mean(words):.1f}"
+            f"- {name}: count={len(typed)}, typed_chars_mean={typed.mean():.1f}, words_mean={words.mean():.1f}"
         )
 
 
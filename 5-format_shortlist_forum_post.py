@@ -1,8 +1,12 @@
 import argparse
 import csv
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 
 BAND_ORDER = ["easy", "medium", "hard"]
+BAND_RANK = {band: rank for rank, band in enumerate(BAND_ORDER)}
 
 
 def slug_to_author_name(link: str) -> str:
@@ -11,8 +15,13 @@ def slug_to_author_name(link: str) -> str:
     if len(parts) < 2:
         return "Unknown Author"
 
-    author_slug = parts[-2]
-    return " ".join(word.capitalize() for word in author_slug.split("-"))
+    return _prettify_author_slug(parts[-2])
+
+
+@lru_cache(maxsize=1024)
+def _prettify_author_slug(author_slug: str) -> str:
+    # Keyed by slug rather than link: links are unique per poem, authors repeat.
+    return author_slug.replace("-", " ").title()
 
 
 def load_rows(csv_path: Path) -> list[dict[str, str]]:
@@ -21,23 +30,32 @@ def load_rows(csv_path: Path) -> list[dict[str, str]]:
         return [row for row in reader]
 
 
-def build_output(rows: list[dict[str, str]]) -> str:
-    grouped: dict[str, list[dict[str, str]]] = {band: [] for band in BAND_ORDER}
+def _band_rank(row: dict[str, str]) -> int | None:
+    return BAND_RANK.get((row.get("band") or "").strip().lower())
+
 
-    for row in rows:
-        band = (row.get("band") or "").strip().lower()
-        if band in grouped:
-            grouped[band].append(row)
+def _format_row(row: dict[str, str]) -> str:
+    link = (row.get("link") or "").strip()
+    title = (row.get("title") or "").strip()
+    return f"* [url={link}]{title} by {slug_to_author_name(link)}[/url]"
+
+
+def build_output(rows: list[dict[str, str]]) -> str:
+    # Stable sort keeps shortlist order within each band; rows with unknown bands are dropped.
+    ranked = sorted(
+        ((rank, row) for row in rows if (rank := _band_rank(row)) is not None),
+        key=itemgetter(0),
+    )
+    groups = groupby(ranked, key=itemgetter(0))
+    group = next(groups, None)
 
     lines: list[str] = []
     for idx, band in enumerate(BAND_ORDER):
         lines.append(f"[h2]Poems included - {band}[/h2]")
 
-        for row in grouped[band]:
-            link = (row.get("link") or "").strip()
-            title = (row.get("title") or "").strip()
-            author = slug_to_author_name(link)
-            lines.append(f"* [url={link}]{title} by {author}[/url]")
+        if group is not None and group[0] == idx:
+            lines.extend(_format_row(row) for _, row in group[1])
+            group = next(groups, None)
 
         if idx < len(BAND_ORDER) - 1:
             lines.append("")